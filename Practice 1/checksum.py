@@ -0,0 +1,24 @@
+"""
+Running CRC32C / CRC32 checksums shared by the file transfer client and server
+"""
+
+import zlib
+
+try:
+    import google_crc32c
+except ImportError:
+    google_crc32c = None
+
+# Prefer SSE 4.2 CRC32C when google-crc32c is installed
+CHECKSUM_ALGORITHM = 'crc32c' if google_crc32c is not None else 'crc32'
+
+def can_verify(algorithm):
+    """Return True if checksums of the given algorithm can be computed here"""
+    return algorithm != 'crc32c' or google_crc32c is not None
+
+def update_checksum(checksum, data, algorithm):
+    """Extend a running CRC32C or CRC32 checksum over data"""
+    if algorithm == 'crc32c':
+        # extend() only accepts read-only buffers such as bytes
+        return google_crc32c.extend(checksum, bytes(data))
+    return zlib.crc32(data, checksum)
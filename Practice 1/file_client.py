@@ -2,9 +2,31 @@ import socket
 import os
 import struct
 import sys
+import zlib
 
-def send_file(filename, host='127.0.0.1', port=5001):
-    """Send file to server"""
+from checksum import CHECKSUM_ALGORITHM, update_checksum
+
+# Bytes read and sent per slice; progress is reported between slices
+SEND_CHUNK_SIZE = 1024 * 1024
+
+# Metadata header flag: file data is sent as a zlib stream
+FLAG_COMPRESSED = 0x01
+
+# Metadata header flag: the checksum trailer is CRC32C rather than zlib CRC32
+FLAG_CRC32C = 0x02
+
+# Fast zlib level; higher levels cost far more CPU for little gain
+COMPRESSION_LEVEL = 1
+
+# Formats that are already compressed and are always sent as-is
+INCOMPRESSIBLE_EXTENSIONS = {
+    '.zip', '.gz', '.bz2', '.xz', '.zst', '.7z', '.rar',
+    '.jpg', '.jpeg', '.png', '.gif', '.webp',
+    '.mp3', '.mp4', '.mkv', '.avi', '.mov', '.webm',
+}
+
+def send_file(filename, host='127.0.0.1', port=5001, compress=False):
+    """Send file to server, optionally compressing the data with zlib"""
     # Check if file exists
     if not os.path.exists(filename):
         print(f"[-] Error: File '{filename}' not found")
@@ -15,10 +37,23 @@ def send_file(filename, host='127.0.0.1', port=5001):
     print(f"[*] File: {filename}")
     print(f"[*] Size: {filesize} bytes")
     
+    # Skip compression for formats that will not shrink
+    if compress and os.path.splitext(filename)[1].lower() in INCOMPRESSIBLE_EXTENSIONS:
+        print("[*] File is already compressed, sending as-is")
+        compress = False
+    flags = FLAG_COMPRESSED if compress else 0
+    
+    if CHECKSUM_ALGORITHM == 'crc32c':
+        flags |= FLAG_CRC32C
+    
     try:
         # Create socket
         client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         
+        # Disable Nagle for the small metadata writes; buffer sizes are left
+        # to the kernel's autotuning, which setting SO_SNDBUF would disable
+        client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        
         # Connect to server
         print(f"[*] Connecting to {host}:{port}...")
         client_socket.connect((host, port))
@@ -27,16 +62,12 @@ def send_file(filename, host='127.0.0.1', port=5001):
         # Get basename of file
         basename = os.path.basename(filename)
         
-        # Send filename length (4 bytes)
+        # Send filename length (4 bytes), filename, file size (8 bytes) and
+        # flags (1 byte) as a single header so the metadata goes out in one segment
         filename_bytes = basename.encode('utf-8')
         filename_len = len(filename_bytes)
-        client_socket.send(struct.pack('!I', filename_len))
-        
-        # Send filename
-        client_socket.send(filename_bytes)
-        
-        # Send file size (8 bytes)
-        client_socket.send(struct.pack('!Q', filesize))
+        header = struct.pack(f'!I{filename_len}sQB', filename_len, filename_bytes, filesize, flags)
+        client_socket.sendall(header)
         
         # Wait for metadata acknowledgment
         metadata_ack = client_socket.recv(1024)
@@ -46,22 +77,46 @@ def send_file(filename, host='127.0.0.1', port=5001):
         
         print("[+] Metadata acknowledged by server")
         
-        # Send file data
+        # Send file data, either raw or through a zlib stream, in slices
+        # to report progress
+        if compress:
+            print(f"[*] Compressing data (zlib level {COMPRESSION_LEVEL})")
+            compressor = zlib.compressobj(COMPRESSION_LEVEL)
+        chunk = memoryview(bytearray(SEND_CHUNK_SIZE))
+        checksum = 0
         bytes_sent = 0
+        next_report = 0
+        progress_format = f"\r[*] Progress: %d%% (%d/{filesize} bytes)"
         with open(filename, 'rb') as f:
+            # Tell the kernel the file is read sequentially (more read-ahead)
+            if hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            
             while bytes_sent < filesize:
-                # Read chunk
-                chunk = f.read(4096)
-                if not chunk:
+                # Read the slice once; the same buffer feeds the checksum
+                # and the socket (or the compressor)
+                count = min(SEND_CHUNK_SIZE, filesize - bytes_sent)
+                sent = f.readinto(chunk[:count])
+                if not sent:
                     break
+                checksum = update_checksum(checksum, chunk[:sent], CHECKSUM_ALGORITHM)
                 
-                # Send chunk
-                client_socket.send(chunk)
-                bytes_sent += len(chunk)
+                if compress:
+                    client_socket.sendall(compressor.compress(chunk[:sent]))
+                else:
+                    client_socket.sendall(chunk[:sent])
+                bytes_sent += sent
                 
-                # Show progress
-                progress = (bytes_sent / filesize) * 100
-                print(f"\r[*] Progress: {progress:.2f}% ({bytes_sent}/{filesize} bytes)", end='')
+                # Show progress (about every 1% to limit stdout writes)
+                if bytes_sent >= next_report or bytes_sent == filesize:
+                    sys.stdout.write(progress_format % (bytes_sent * 100 // filesize, bytes_sent))
+                    next_report = bytes_sent + filesize // 100
+            
+            if compress:
+                client_socket.sendall(compressor.flush())
+        
+        # Send checksum of the file data (4 bytes) after the payload
+        client_socket.sendall(struct.pack('!I', checksum))
         
         print("\n[*] Waiting for server acknowledgment...")
         
@@ -99,9 +154,10 @@ def main():
     host = input("Enter server IP (default 127.0.0.1): ").strip() or '127.0.0.1'
     port_input = input("Enter server port (default 5001): ").strip()
     port = int(port_input) if port_input else 5001
+    compress = input("Compress data? (y/N): ").strip().lower() == 'y'
     
     # Send file
-    send_file(filename, host, port)
+    send_file(filename, host, port, compress)
 
 if __name__ == "__main__":
     main()
@@ -1,64 +1,173 @@
 import socket
 import os
 import struct
+import sys
+import tempfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from checksum import can_verify, update_checksum
+
+# Size of the per-connection receive buffer reused for metadata and file data;
+# 1 MiB keeps recv/write syscalls few on multi-MiB payloads
+RECV_BUFFER_SIZE = 1024 * 1024
+
+# Maximum number of files received concurrently
+MAX_WORKERS = 32
+
+# Pending connections queued by the kernel while all workers are busy
+LISTEN_BACKLOG = 128
+
+# Seconds a client may stay silent before its worker gives up on it
+SOCKET_TIMEOUT = 60
+
+# Metadata header flag: file data is sent as a zlib stream
+FLAG_COMPRESSED = 0x01
+
+# Metadata header flag: the checksum trailer is CRC32C rather than zlib CRC32
+FLAG_CRC32C = 0x02
+
+def recv_exact(sock, n, buf):
+    """Receive exactly n bytes from sock into buf and return a view of them"""
+    mv = memoryview(buf)
+    offset = 0
+    while offset < n:
+        received = sock.recv_into(mv[offset:n])
+        if not received:
+            raise ConnectionError(f"Connection closed after {offset}/{n} bytes")
+        offset += received
+    return mv[:n]
 
 def receive_file(conn, addr):
     """Receive file from client"""
     print(f"[+] Connection established with {addr}")
     
+    # Preallocate one buffer for the whole connection
+    buf = bytearray(RECV_BUFFER_SIZE)
+    mv = memoryview(buf)
+    part_path = None
+    
     try:
         # Receive filename length (4 bytes)
-        filename_len_data = conn.recv(4)
-        if not filename_len_data:
-            print("[-] No data received")
-            return
-        
-        filename_len = struct.unpack('!I', filename_len_data)[0]
+        filename_len = struct.unpack('!I', recv_exact(conn, 4, buf))[0]
         print(f"[*] Filename length: {filename_len}")
+        if filename_len + 9 > RECV_BUFFER_SIZE:
+            raise ValueError(f"Filename too long ({filename_len} bytes)")
         
-        # Receive filename
-        filename = conn.recv(filename_len).decode('utf-8')
+        # Receive filename, file size (8 bytes) and flags (1 byte) in one read
+        metadata = recv_exact(conn, filename_len + 9, buf)
+        filename = str(metadata[:filename_len], 'utf-8')
+        filesize, flags = struct.unpack('!QB', metadata[filename_len:])
         print(f"[*] Receiving file: {filename}")
-        
-        # Receive file size (8 bytes)
-        filesize_data = conn.recv(8)
-        filesize = struct.unpack('!Q', filesize_data)[0]
         print(f"[*] File size: {filesize} bytes")
         
+        # Compressed data is a zlib stream that ends on its own marker
+        decompressor = zlib.decompressobj() if flags & FLAG_COMPRESSED else None
+        if decompressor:
+            print("[*] Data is zlib-compressed")
+        
+        # CRC32C can only be checked when google-crc32c is installed here too
+        algorithm = 'crc32c' if flags & FLAG_CRC32C else 'crc32'
+        verify_checksum = can_verify(algorithm)
+        if not verify_checksum:
+            print("[!] google-crc32c not installed, skipping CRC32C verification")
+        
         # Send acknowledgment for metadata
-        conn.send(b"METADATA_OK")
+        conn.sendall(b"METADATA_OK")
         
         # Create received_files directory if it doesn't exist
         os.makedirs("received_files", exist_ok=True)
         
-        # Receive file data
+        # Receive file data into a .part file of this transfer's own, which
+        # only replaces the final path once the transfer is verified;
+        # concurrent uploads of the same name never share a temp file
         filepath = os.path.join("received_files", filename)
+        fd, part_path = tempfile.mkstemp(dir="received_files", prefix=filename + ".", suffix=".part")
         bytes_received = 0
+        next_report = 0
+        progress_format = f"\r[*] Progress: %d%% (%d/{filesize} bytes)"
+        checksum = 0
         
-        with open(filepath, 'wb') as f:
-            while bytes_received < filesize:
-                # Read in chunks of 4096 bytes
-                chunk_size = min(4096, filesize - bytes_received)
-                data = conn.recv(chunk_size)
+        with os.fdopen(fd, 'wb') as f:
+            # Reserve the whole file up front so the filesystem can allocate
+            # contiguous extents instead of growing it write by write
+            if filesize and hasattr(os, 'posix_fallocate'):
+                os.posix_fallocate(f.fileno(), 0, filesize)
+            
+            while bytes_received < filesize or (decompressor and not decompressor.eof):
+                # Read straight into the preallocated buffer
+                if decompressor:
+                    chunk_size = RECV_BUFFER_SIZE
+                else:
+                    chunk_size = min(RECV_BUFFER_SIZE, filesize - bytes_received)
+                received = conn.recv_into(mv[:chunk_size])
+                
+                if not received:
+                    raise ConnectionError(f"Connection closed after {bytes_received}/{filesize} bytes")
+                
+                # Inflate at most one buffer at a time so a small, highly
+                # compressed input cannot expand into a huge allocation
+                if decompressor:
+                    data = decompressor.decompress(mv[:received], RECV_BUFFER_SIZE)
+                else:
+                    data = mv[:received]
                 
-                if not data:
-                    break
+                while data:
+                    # Check the size before anything is written past the end
+                    bytes_received += len(data)
+                    if bytes_received > filesize:
+                        raise ValueError(f"Compressed data exceeds file size ({filesize} bytes)")
+                    f.write(data)
+                    if verify_checksum:
+                        checksum = update_checksum(checksum, data, algorithm)
+                    
+                    # A full output buffer may leave input, or pending output,
+                    # behind in the decompressor; after the end of the stream
+                    # any leftover input is the trailer in unused_data
+                    if decompressor and not decompressor.eof and (decompressor.unconsumed_tail or len(data) == RECV_BUFFER_SIZE):
+                        data = decompressor.decompress(decompressor.unconsumed_tail, RECV_BUFFER_SIZE)
+                    else:
+                        data = None
                 
-                f.write(data)
-                bytes_received += len(data)
+                if decompressor and decompressor.eof and bytes_received < filesize:
+                    raise ValueError(f"Compressed data does not match file size ({bytes_received}/{filesize} bytes)")
                 
-                # Show progress
-                progress = (bytes_received / filesize) * 100
-                print(f"\r[*] Progress: {progress:.2f}% ({bytes_received}/{filesize} bytes)", end='')
+                # Show progress (about every 1% to limit stdout writes)
+                if filesize and (bytes_received >= next_report or bytes_received == filesize):
+                    sys.stdout.write(progress_format % (bytes_received * 100 // filesize, bytes_received))
+                    next_report = bytes_received + filesize // 100
+            
+            # Written data will not be read back here; let the kernel
+            # drop its cached pages once they are flushed
+            if hasattr(os, 'posix_fadvise'):
+                f.flush()
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+        
+        # Receive checksum (4 bytes); part of it may already have been read
+        # past the end of a compressed stream
+        trailer = decompressor.unused_data if decompressor else b""
+        if len(trailer) < 4:
+            trailer += bytes(recv_exact(conn, 4 - len(trailer), buf))
+        expected_checksum = struct.unpack('!I', trailer)[0]
+        if verify_checksum and checksum != expected_checksum:
+            raise ValueError(f"Checksum mismatch (expected {expected_checksum:08x}, got {checksum:08x})")
         
+        os.replace(part_path, filepath)
         print(f"\n[+] File received successfully: {filepath}")
         
         # Send final acknowledgment
-        conn.send(b"OK")
+        conn.sendall(b"OK")
         
     except Exception as e:
         print(f"[-] Error: {e}")
-        conn.send(b"ERROR")
+        # Do not leave a partial, zero-padded file behind; only this
+        # transfer's own temp file is removed
+        if part_path and os.path.exists(part_path):
+            os.remove(part_path)
+        try:
+            conn.sendall(b"ERROR")
+        except OSError:
+            pass
     
     finally:
         conn.close()
@@ -70,27 +179,55 @@ def start_server(host='0.0.0.0', port=5001):
     
     # Set socket options to reuse address
     server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if hasattr(socket, 'SO_REUSEPORT'):
+        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
     
     # Bind socket to address
     server_socket.bind((host, port))
     
     # Listen for connections
-    server_socket.listen(5)
+    server_socket.listen(LISTEN_BACKLOG)
     print(f"[*] Server listening on {host}:{port}")
     print("[*] Waiting for connections...")
     
+    # Worker threads receive files so the accept loop never blocks
+    pool = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+    connections = set()
+    
+    def release(future, conn):
+        # A cancelled transfer never ran, so its socket is closed here
+        connections.discard(conn)
+        if future.cancelled():
+            conn.close()
+    
     try:
         while True:
             # Accept connection
             conn, addr = server_socket.accept()
             
-            # Receive file (in real implementation, this should be in a separate thread)
-            receive_file(conn, addr)
+            # Disable Nagle so acknowledgments are not delayed, and drop
+            # idle clients instead of holding a worker forever
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            conn.settimeout(SOCKET_TIMEOUT)
+            
+            # Receive file in a worker thread
+            connections.add(conn)
+            future = pool.submit(receive_file, conn, addr)
+            future.add_done_callback(lambda future, conn=conn: release(future, conn))
             
     except KeyboardInterrupt:
         print("\n[*] Server shutting down...")
     finally:
         server_socket.close()
+        # Drop queued connections (their callbacks close them) and wake
+        # workers blocked on stalled clients so the process can exit
+        # without waiting for them
+        pool.shutdown(wait=False, cancel_futures=True)
+        for conn in list(connections):
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
 
 if __name__ == "__main__":
     print("=" * 50)
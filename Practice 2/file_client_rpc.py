@@ -1,13 +1,65 @@
 """
 RPC File Transfer Client
-Uses XML-RPC to send files to the server
+Uses a length-prefixed binary RPC protocol over TCP to send files to the server
 """
 
-import xmlrpc.client
+import socket
 import os
-import base64
 import sys
 
+from checksum import CHECKSUM_ALGORITHM, update_checksum
+from rpc_protocol import send_frame, recv_frame
+
+# Size of each chunk sent in one upload_chunk() call
+CHUNK_SIZE = 4 * 1024 * 1024
+
+
+class RPCError(Exception):
+    """Error reported by the server for a failed call"""
+
+
+class RPCProxy:
+    """
+    Client proxy for the file transfer RPC server
+    
+    All calls share one persistent TCP connection. proxy.name(*params)
+    calls the server method of that name; binary data is passed with the
+    payload keyword and arrives as the method's last argument, even when
+    it is empty.
+    """
+    
+    def __init__(self, host, port):
+        self.sock = socket.create_connection((host, port))
+        # Requests are small; do not let Nagle hold them back
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    
+    def call(self, method, *params, payload=None):
+        """Call a server method and return its result"""
+        message = {'method': method, 'params': list(params)}
+        if payload is None:
+            payload = b''
+        else:
+            # Flag the payload so the server passes it on even when empty
+            message['payload'] = True
+        send_frame(self.sock, message, payload)
+        frame = recv_frame(self.sock)
+        if frame is None:
+            raise ConnectionError("Connection closed by server")
+        
+        message, _ = frame
+        if 'error' in message:
+            raise RPCError(message['error'])
+        return message['result']
+    
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return lambda *params, payload=None: self.call(name, *params, payload=payload)
+    
+    def close(self):
+        """Close the connection to the server"""
+        self.sock.close()
+
 
 def send_file(filename, host='127.0.0.1', port=8000):
     """
@@ -38,12 +90,11 @@ def send_file(filename, host='127.0.0.1', port=8000):
     print(f"Server: {host}:{port}")
     print("-" * 60)
     
+    proxy = None
     try:
         # Create RPC client proxy
-        server_url = f"http://{host}:{port}"
-        print(f"[*] Connecting to {server_url}...")
-        
-        proxy = xmlrpc.client.ServerProxy(server_url)
+        print(f"[*] Connecting to {host}:{port}...")
+        proxy = RPCProxy(host, port)
         
         # Test connection
         try:
@@ -54,18 +105,37 @@ def send_file(filename, host='127.0.0.1', port=8000):
             print(f"[-] Cannot connect to server: {e}")
             return False
         
-        # Read file and encode to base64
-        print(f"[*] Reading file: {filename}")
-        with open(filename, 'rb') as f:
-            file_data = f.read()
-        
-        # Encode to base64 for transmission
-        file_data_base64 = base64.b64encode(file_data).decode('utf-8')
-        
+        # Stream the file in chunks instead of loading it into memory
         print(f"[*] Uploading file to server...")
+        result = proxy.begin_upload(basename)
+        if result['status'] != 'success':
+            print(f"[-] Upload failed: {result['message']}")
+            return False
+        upload_id = result['upload_id']
+        offset = 0
+        checksum = 0
+        buf = memoryview(bytearray(CHUNK_SIZE))
+        with open(filename, 'rb') as f:
+            # Tell the kernel the file is read sequentially (more read-ahead)
+            if hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            
+            while True:
+                # Read into the reusable buffer instead of a new bytes object
+                chunk_length = f.readinto(buf)
+                if not chunk_length:
+                    break
+                chunk = buf[:chunk_length]
+                
+                result = proxy.upload_chunk(upload_id, offset, payload=chunk)
+                if result['status'] != 'success':
+                    print(f"[-] Upload failed: {result['message']}")
+                    return False
+                offset += chunk_length
+                checksum = update_checksum(checksum, chunk, CHECKSUM_ALGORITHM)
         
-        # Call RPC method to upload file
-        result = proxy.upload_file(basename, file_data_base64)
+        # Ask the server to assemble and verify the uploaded chunks
+        result = proxy.finalize_upload(upload_id, offset, checksum, CHECKSUM_ALGORITHM)
         
         # Check result
         if result['status'] == 'success':
@@ -84,6 +154,9 @@ def send_file(filename, host='127.0.0.1', port=8000):
     except Exception as e:
         print(f"[-] Error: {e}")
         return False
+    finally:
+        if proxy is not None:
+            proxy.close()
 
 
 def main():
@@ -1,13 +1,85 @@
 """
 RPC File Transfer Server
-Uses XML-RPC to receive files from clients
+Uses a length-prefixed binary RPC protocol over TCP to receive files from clients
 """
 
-from xmlrpc.server import SimpleXMLRPCServer
+import socket
+import socketserver
 import os
-import base64
+import tempfile
+import threading
 from datetime import datetime
 
+from checksum import can_verify, update_checksum
+from rpc_protocol import send_frame, recv_frame
+
+# Block size used to read back uploaded files for checksum verification
+CHECKSUM_BLOCK_SIZE = 4 * 1024 * 1024
+
+# Seconds a client may stay silent before its connection is dropped
+SOCKET_TIMEOUT = 60
+
+
+class FileTransferRequestHandler(socketserver.BaseRequestHandler):
+    """Serves RPC calls from one client connection until it disconnects"""
+    
+    def setup(self):
+        # Responses are small; do not let Nagle hold them back
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        # Connections are persistent; drop idle clients instead of
+        # holding a handler thread forever
+        self.request.settimeout(SOCKET_TIMEOUT)
+    
+    def handle(self):
+        service = self.server.service
+        try:
+            while True:
+                frame = recv_frame(self.request)
+                if frame is None:
+                    break
+                message, payload = frame
+                
+                # A call is a {method, params} object; reject anything else
+                if not isinstance(message, dict):
+                    send_frame(self.request, {'error': 'Malformed request: expected an object'})
+                    continue
+                name = message.get('method')
+                params = message.get('params', [])
+                if not isinstance(name, str) or not isinstance(params, list):
+                    send_frame(self.request, {'error': 'Malformed request: bad method or params'})
+                    continue
+                
+                # Only public methods of the service can be called
+                method = getattr(service, name, None)
+                if name.startswith('_') or not callable(method):
+                    send_frame(self.request, {'error': f'Unknown method: {name}'})
+                    continue
+                
+                # A binary payload, even an empty one, is passed as the
+                # last argument when the call is flagged as carrying one
+                if message.get('payload'):
+                    params.append(payload)
+                
+                try:
+                    response = {'result': method(*params)}
+                except Exception as e:
+                    response = {'error': f'{type(e).__name__}: {e}'}
+                send_frame(self.request, response)
+                
+        except (OSError, ValueError) as e:
+            # OSError covers ConnectionError and socket timeouts
+            print(f"[-] Connection {self.client_address} dropped: {e}")
+
+
+class FileTransferRPCServer(socketserver.ThreadingTCPServer):
+    """RPC server that handles each connection in its own thread"""
+    daemon_threads = True
+    allow_reuse_address = True
+    
+    def __init__(self, server_address, service):
+        super().__init__(server_address, FileTransferRequestHandler)
+        self.service = service
+
 
 class FileTransferServer:
     """RPC Server for file transfer operations"""
@@ -16,30 +88,118 @@ class FileTransferServer:
         self.received_dir = "received_files"
         # Create received_files directory if it doesn't exist
         os.makedirs(self.received_dir, exist_ok=True)
-        
-    def upload_file(self, filename, file_data_base64):
+        # Uploads in progress: upload id -> (filename, temporary file path);
+        # shared by all connection threads
+        self.uploads = {}
+        self.uploads_lock = threading.Lock()
+    
+    def begin_upload(self, filename):
         """
-        RPC method to receive and save a file
+        RPC method to start a chunked upload
+        
+        Each upload gets its own temporary ".part" file, so concurrent
+        uploads of the same filename never write to the same file.
         
         Args:
             filename (str): Name of the file
-            file_data_base64 (str): Base64 encoded file content
             
         Returns:
-            dict: Status and message
+            dict: Status and the upload id to pass to the other upload calls
+        """
+        try:
+            fd, part_path = tempfile.mkstemp(dir=self.received_dir, prefix=filename + ".", suffix=".part")
+            os.close(fd)
+            upload_id = os.path.basename(part_path)
+            with self.uploads_lock:
+                self.uploads[upload_id] = (filename, part_path)
+            
+            return {
+                'status': 'success',
+                'upload_id': upload_id
+            }
+            
+        except Exception as e:
+            error_msg = f'Error starting upload: {str(e)}'
+            print(f"[-] {error_msg}")
+            return {
+                'status': 'error',
+                'message': error_msg
+            }
+    
+    def upload_chunk(self, upload_id, offset, chunk):
+        """
+        RPC method to write one chunk of a file being uploaded
+        
+        Chunks are written to the upload's temporary ".part" file until
+        finalize_upload() is called.
+        
+        Args:
+            upload_id (str): Upload id returned by begin_upload()
+            offset (int): Byte offset of the chunk within the file
+            chunk (bytes): Chunk content
+            
+        Returns:
+            dict: Status and number of bytes written
         """
         try:
-            # Decode base64 data
-            file_data = base64.b64decode(file_data_base64)
+            with self.uploads_lock:
+                upload = self.uploads.get(upload_id)
+            if upload is None:
+                raise ValueError(f'unknown upload id {upload_id!r}')
+            _, part_path = upload
             
-            # Create filepath
+            with open(part_path, 'r+b') as f:
+                f.seek(offset)
+                f.write(chunk)
+            
+            return {
+                'status': 'success',
+                'size': len(chunk)
+            }
+            
+        except Exception as e:
+            error_msg = f'Error uploading chunk: {str(e)}'
+            print(f"[-] {error_msg}")
+            return {
+                'status': 'error',
+                'message': error_msg
+            }
+    
+    def finalize_upload(self, upload_id, filesize, checksum, algorithm):
+        """
+        RPC method to complete a chunked upload
+        
+        Args:
+            upload_id (str): Upload id returned by begin_upload()
+            filesize (int): Expected size of the file in bytes
+            checksum (int): Expected checksum of the file
+            algorithm (str): Checksum algorithm, 'crc32c' or 'crc32'
+            
+        Returns:
+            dict: Status and message
+        """
+        try:
+            with self.uploads_lock:
+                upload = self.uploads.pop(upload_id, None)
+            if upload is None:
+                raise ValueError(f'unknown upload id {upload_id!r}')
+            filename, part_path = upload
             filepath = os.path.join(self.received_dir, filename)
             
-            # Write file
-            with open(filepath, 'wb') as f:
-                f.write(file_data)
+            received_size = os.path.getsize(part_path)
+            if received_size != filesize:
+                os.remove(part_path)
+                raise ValueError(f'size mismatch (expected {filesize}, got {received_size})')
             
-            filesize = len(file_data)
+            if not can_verify(algorithm):
+                print("[!] google-crc32c not installed, skipping CRC32C verification")
+            else:
+                actual = self._compute_checksum(part_path, algorithm)
+                if actual != checksum:
+                    os.remove(part_path)
+                    raise ValueError(f'checksum mismatch (expected {checksum:08x}, got {actual:08x})')
+            
+            os.replace(part_path, filepath)
             timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             
             print(f"[{timestamp}] Received file: {filename} ({filesize} bytes)")
@@ -59,6 +219,14 @@ class FileTransferServer:
                 'message': error_msg
             }
     
+    def _compute_checksum(self, filepath, algorithm):
+        """Compute the CRC32C or CRC32 checksum of a file"""
+        checksum = 0
+        with open(filepath, 'rb') as f:
+            for block in iter(lambda: f.read(CHECKSUM_BLOCK_SIZE), b''):
+                checksum = update_checksum(checksum, block, algorithm)
+        return checksum
+    
     def ping(self):
         """Simple ping method to check server availability"""
         return "pong"
@@ -67,7 +235,7 @@ class FileTransferServer:
         """Get server information"""
         return {
             'name': 'RPC File Transfer Server',
-            'version': '1.0',
+            'version': '2.0',
             'received_directory': self.received_dir
         }
 
@@ -75,13 +243,9 @@ class FileTransferServer:
 def start_server(host='0.0.0.0', port=8000):
     """Start the RPC server"""
     
-    # Create server instance
-    server = SimpleXMLRPCServer((host, port), allow_none=True)
-    server.register_introspection_functions()
-    
-    # Create and register file transfer service
+    # Create file transfer service and the server exposing it
     file_service = FileTransferServer()
-    server.register_instance(file_service)
+    server = FileTransferRPCServer((host, port), file_service)
     
     print("=" * 60)
     print("RPC File Transfer Server")
@@ -95,6 +259,8 @@ def start_server(host='0.0.0.0', port=8000):
         server.serve_forever()
     except KeyboardInterrupt:
         print("\n[*] Server shutting down...")
+    finally:
+        server.server_close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,64 @@
+"""
+Framed RPC protocol shared by the RPC file transfer client and server
+
+Each frame is an 8-byte header (JSON message length and binary payload
+length), the UTF-8 JSON message, then the raw payload bytes.
+
+A call is {"method": name, "params": [...]}; a true "payload" field
+passes the frame's payload as the last argument. A reply is either
+{"result": value} or {"error": message}.
+"""
+
+import socket
+import struct
+import json
+
+# Frame header: JSON message length (4 bytes) and binary payload length (4 bytes)
+FRAME_HEADER = struct.Struct('!II')
+
+# Largest JSON message and binary payload accepted in one frame
+MAX_MESSAGE_SIZE = 64 * 1024
+MAX_PAYLOAD_SIZE = 64 * 1024 * 1024
+
+
+def recv_exact(sock, n):
+    """Receive exactly n bytes from sock into a new bytearray"""
+    buf = bytearray(n)
+    mv = memoryview(buf)
+    offset = 0
+    while offset < n:
+        received = sock.recv_into(mv[offset:])
+        if not received:
+            raise ConnectionError(f"Connection closed after {offset}/{n} bytes")
+        offset += received
+    return buf
+
+
+def send_frame(sock, message, payload=b''):
+    """Send a JSON message followed by an optional binary payload"""
+    body = json.dumps(message).encode('utf-8')
+    sock.sendall(FRAME_HEADER.pack(len(body), len(payload)) + body)
+    if payload:
+        sock.sendall(payload)
+
+
+def recv_frame(sock):
+    """
+    Receive one frame
+    
+    Returns:
+        tuple: (message, payload), or None if the peer closed the connection
+    """
+    header = sock.recv(FRAME_HEADER.size, socket.MSG_WAITALL)
+    if not header:
+        return None
+    if len(header) < FRAME_HEADER.size:
+        header += recv_exact(sock, FRAME_HEADER.size - len(header))
+    
+    message_len, payload_len = FRAME_HEADER.unpack(header)
+    if message_len > MAX_MESSAGE_SIZE or payload_len > MAX_PAYLOAD_SIZE:
+        raise ValueError(f"Frame too large ({message_len} + {payload_len} bytes)")
+    
+    message = json.loads(recv_exact(sock, message_len))
+    payload = recv_exact(sock, payload_len) if payload_len else b''
+    return message, payload
@@ -15,7 +15,12 @@ Example:
 from mpi4py import MPI
 import os
 import sys
-import numpy as np
+import zlib
+
+try:
+    import google_crc32c
+except ImportError:
+    google_crc32c = None
 
 # MPI Communicator
 comm = MPI.COMM_WORLD
@@ -23,10 +28,47 @@ rank = comm.Get_rank()
 size = comm.Get_size()
 
 # Constants
-CHUNK_SIZE = 4096
+CHUNK_SIZE = 1 << 20
 RECEIVER_RANK = 0
 SENDER_RANK = 1
 
+# Prefer SSE 4.2 CRC32C when google-crc32c is installed
+CHECKSUM_ALGORITHM = 'crc32c' if google_crc32c is not None else 'crc32'
+
+
+def update_checksum(checksum, data, algorithm):
+    """Extend a running CRC32C or CRC32 checksum over data"""
+    if algorithm == 'crc32c':
+        # extend() only accepts read-only buffers such as bytes
+        return google_crc32c.extend(checksum, bytes(data))
+    return zlib.crc32(data, checksum)
+
+
+def drain_file_data(request):
+    """
+    Discard the sender's remaining file data after a receive error
+    
+    Chunks are large enough to use the rendezvous protocol, so each send
+    only completes once a matching receive is posted; without draining,
+    the sender would block forever instead of getting the error reply.
+    request is the chunk receive still pending, or MPI.REQUEST_NULL.
+    """
+    status = MPI.Status()
+    if request != MPI.REQUEST_NULL:
+        request.Wait(status)
+        if status.Get_count(MPI.BYTE) == 0:
+            comm.recv(source=SENDER_RANK, tag=22)
+            return
+    
+    buf = bytearray(CHUNK_SIZE)
+    while True:
+        comm.Recv([buf, MPI.BYTE], source=SENDER_RANK, tag=21, status=status)
+        if status.Get_count(MPI.BYTE) == 0:
+            break
+    
+    # The checksum follows the end marker
+    comm.recv(source=SENDER_RANK, tag=22)
+
 
 def sender_process(filename):
     """Sender process (Rank 1) - sends file to receiver"""
@@ -45,10 +87,11 @@ def sender_process(filename):
     print(f"[Rank {rank}] Size: {filesize} bytes")
     
     try:
-        # Step 1: Send metadata (filename and size)
+        # Step 1: Send metadata (filename, size and checksum algorithm)
         metadata = {
             'filename': basename,
-            'filesize': filesize
+            'filesize': filesize,
+            'checksum_algorithm': CHECKSUM_ALGORITHM
         }
         print(f"[Rank {rank}] Sending metadata to Rank {RECEIVER_RANK}...")
         comm.send(metadata, dest=RECEIVER_RANK, tag=10)
@@ -60,35 +103,49 @@ def sender_process(filename):
             return False
         print(f"[Rank {rank}] Metadata acknowledged")
         
-        # Step 3: Send file data in chunks
+        # Step 3: Send file data in chunks, double-buffered so the next
+        # chunk is read from disk while the previous one is in flight
+        views = [memoryview(bytearray(CHUNK_SIZE)) for _ in range(2)]
+        requests = [MPI.REQUEST_NULL, MPI.REQUEST_NULL]
+        current = 0
+        checksum = 0
         bytes_sent = 0
+        next_report = 0
+        progress_format = f"\r[Rank {rank}] Progress: %d%% (%d/{filesize} bytes)"
         with open(filename, 'rb') as f:
+            # Tell the kernel the file is read sequentially (more read-ahead)
+            if hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            
             while bytes_sent < filesize:
+                # Wait until the last send from this buffer has completed
+                requests[current].Wait()
+                
                 # Read chunk
-                chunk_data = f.read(CHUNK_SIZE)
-                if not chunk_data:
+                chunk_length = f.readinto(views[current])
+                if not chunk_length:
                     break
                 
-                # Convert to numpy array for MPI.Send
-                chunk_array = np.frombuffer(chunk_data, dtype=np.uint8)
-                chunk_length = len(chunk_array)
-                
-                # Send chunk length first
-                comm.send(chunk_length, dest=RECEIVER_RANK, tag=20)
-                
-                # Send chunk data
-                comm.Send(chunk_array, dest=RECEIVER_RANK, tag=21)
+                # Send chunk data; the receiver reads its length from the status
+                requests[current] = comm.Isend([views[current][:chunk_length], MPI.BYTE],
+                                               dest=RECEIVER_RANK, tag=21)
                 
+                # Checksum the chunk while it is in flight
+                checksum = update_checksum(checksum, views[current][:chunk_length], CHECKSUM_ALGORITHM)
                 bytes_sent += chunk_length
+                current ^= 1
                 
-                # Show progress
-                progress = (bytes_sent / filesize) * 100
-                print(f"\r[Rank {rank}] Progress: {progress:.2f}% ({bytes_sent}/{filesize} bytes)", end='')
+                # Show progress (about every 1% to limit stdout writes)
+                if bytes_sent >= next_report or bytes_sent == filesize:
+                    sys.stdout.write(progress_format % (bytes_sent * 100 // filesize, bytes_sent))
+                    next_report = bytes_sent + filesize // 100
         
+        MPI.Request.Waitall(requests)
         print(f"\n[Rank {rank}] File sent successfully")
         
-        # Step 4: Send end marker
-        comm.send(0, dest=RECEIVER_RANK, tag=20)
+        # Step 4: Send end marker (empty chunk)
+        comm.Send([b'', MPI.BYTE], dest=RECEIVER_RANK, tag=21)
+        comm.send(checksum, dest=RECEIVER_RANK, tag=22)
         
         # Step 5: Wait for final acknowledgment
         final_ack = comm.recv(source=RECEIVER_RANK, tag=30)
@@ -108,61 +165,138 @@ def receiver_process():
     """Receiver process (Rank 0) - receives file from sender"""
     print(f"[Rank {rank}] Starting receiver process")
     print(f"[Rank {rank}] Waiting for file from Rank {SENDER_RANK}...")
+    part_path = None
+    # True while the sender may still be sending file data
+    receiving_data = False
+    request = MPI.REQUEST_NULL
     
     try:
         # Step 1: Receive metadata
         metadata = comm.recv(source=SENDER_RANK, tag=10)
         filename = metadata['filename']
         filesize = metadata['filesize']
+        algorithm = metadata['checksum_algorithm']
         
         print(f"[Rank {rank}] Receiving file: {filename}")
         print(f"[Rank {rank}] Expected size: {filesize} bytes")
         
+        # CRC32C can only be checked when google-crc32c is installed here too
+        verify_checksum = algorithm != 'crc32c' or google_crc32c is not None
+        if not verify_checksum:
+            print(f"[Rank {rank}] Warning: google-crc32c not installed, skipping CRC32C verification")
+        
         # Step 2: Send metadata acknowledgment
         comm.send("METADATA_OK", dest=SENDER_RANK, tag=11)
+        receiving_data = True
         
         # Step 3: Create received_files directory if needed
         os.makedirs("received_files", exist_ok=True)
         filepath = os.path.join("received_files", filename)
         
-        # Step 4: Receive file data
+        # Data goes to a .part file that only replaces the final path once
+        # the transfer is verified
+        part_path = filepath + ".part"
+        
+        # Step 4: Receive file data, double-buffered so the next chunk is
+        # already being received while the current one is written with
+        # non-blocking MPI-IO
         bytes_received = 0
-        with open(filepath, 'wb') as f:
-            while bytes_received < filesize:
-                # Receive chunk length
-                chunk_length = comm.recv(source=SENDER_RANK, tag=20)
+        next_report = 0
+        progress_format = f"\r[Rank {rank}] Progress: %d%% (%d/{filesize} bytes)"
+        views = [memoryview(bytearray(CHUNK_SIZE)) for _ in range(2)]
+        status = MPI.Status()
+        current = 0
+        checksum = 0
+        write_request = MPI.REQUEST_NULL
+        
+        # Create (or truncate) the file and reserve it up front so the
+        # filesystem can allocate contiguous extents; MPI_File_preallocate
+        # would write the whole file with zeros instead
+        fd = os.open(part_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            if filesize and hasattr(os, 'posix_fallocate'):
+                os.posix_fallocate(fd, 0, filesize)
+        finally:
+            os.close(fd)
+        
+        fh = MPI.File.Open(MPI.COMM_SELF, part_path, MPI.MODE_WRONLY)
+        try:
+            # Post the first receive only once the file is ready, so a
+            # failed open never leaves a receive pending
+            request = comm.Irecv([views[current], MPI.BYTE], source=SENDER_RANK, tag=21)
+            
+            while True:
+                # Wait for the chunk in the current buffer
+                request.Wait(status)
+                chunk_length = status.Get_count(MPI.BYTE)
                 
                 # Check for end marker
                 if chunk_length == 0:
+                    receiving_data = False
                     break
                 
-                # Receive chunk data
-                chunk_array = np.empty(chunk_length, dtype=np.uint8)
-                comm.Recv(chunk_array, source=SENDER_RANK, tag=21)
+                # The other buffer is free once its write has completed;
+                # post the next receive into it
+                write_request.Wait()
+                request = comm.Irecv([views[current ^ 1], MPI.BYTE], source=SENDER_RANK, tag=21)
                 
-                # Write to file
-                f.write(chunk_array.tobytes())
+                # Write to file while the next chunk is being received
+                write_request = fh.Iwrite_at(bytes_received, [views[current][:chunk_length], MPI.BYTE])
+                if verify_checksum:
+                    checksum = update_checksum(checksum, views[current][:chunk_length], algorithm)
                 bytes_received += chunk_length
+                current ^= 1
                 
-                # Show progress
-                progress = (bytes_received / filesize) * 100
-                print(f"\r[Rank {rank}] Progress: {progress:.2f}% ({bytes_received}/{filesize} bytes)", end='')
+                # Show progress (about every 1% to limit stdout writes)
+                if bytes_received >= next_report or bytes_received == filesize:
+                    sys.stdout.write(progress_format % (bytes_received * 100 // filesize, bytes_received))
+                    next_report = bytes_received + filesize // 100
+        finally:
+            # Complete any write still in flight before closing
+            write_request.Wait()
+            fh.Close()
+        
+        # Written data will not be read back here; let the kernel drop its
+        # cached pages once they are flushed
+        if hasattr(os, 'posix_fadvise'):
+            fd = os.open(part_path, os.O_RDONLY)
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            finally:
+                os.close(fd)
         
         print(f"\n[Rank {rank}] File received successfully: {filepath}")
+        expected_checksum = comm.recv(source=SENDER_RANK, tag=22)
         
-        # Step 5: Verify file size
-        actual_size = os.path.getsize(filepath)
-        if actual_size == filesize:
-            print(f"[Rank {rank}] File integrity verified (size matches)")
-            comm.send("OK", dest=SENDER_RANK, tag=30)
-            return True
-        else:
-            print(f"[Rank {rank}] Warning: File size mismatch! Expected {filesize}, got {actual_size}")
+        # Step 5: Verify file size and checksum; the file on disk was
+        # preallocated, so its size is checked by the bytes received
+        if bytes_received != filesize:
+            print(f"[Rank {rank}] Warning: File size mismatch! Expected {filesize}, got {bytes_received}")
+            os.remove(part_path)
             comm.send("SIZE_MISMATCH", dest=SENDER_RANK, tag=30)
             return False
+        elif verify_checksum and checksum != expected_checksum:
+            print(f"[Rank {rank}] Warning: Checksum mismatch! Expected {expected_checksum:08x}, got {checksum:08x}")
+            os.remove(part_path)
+            comm.send("CHECKSUM_MISMATCH", dest=SENDER_RANK, tag=30)
+            return False
+        else:
+            checked = f"size and {algorithm}" if verify_checksum else "size"
+            print(f"[Rank {rank}] File integrity verified ({checked} match)")
+            os.replace(part_path, filepath)
+            comm.send("OK", dest=SENDER_RANK, tag=30)
+            return True
             
     except Exception as e:
         print(f"[Rank {rank}] Error: {e}")
+        if receiving_data:
+            drain_file_data(request)
+        # Do not leave a partial, zero-padded file behind
+        if part_path and os.path.exists(part_path):
+            try:
+                os.remove(part_path)
+            except OSError:
+                pass
         comm.send("ERROR", dest=SENDER_RANK, tag=30)
         return False
 